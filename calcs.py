@@ -3,17 +3,19 @@ This file contains numerous statsitical calculations on a charging network that
 can be useful to characterize the macrobehavior of the network.
 """
 
+import math
 import numpy as np
 
 def getPercentage(charger, AllEV):
     # Input:
-    #     charger     - 1-by-numAllEV list of dictionaries representning the start of
-    #                   current control interval with fields:
-    #         active  - 1 if there is an active EV charging at charger ii,
-    #                   0 otherwise
-    #         EV      - 1x3 row vector with columns remaining energy demand at
-    #                   START of current control interval, remaning parking
-    #                   time and peak charging rate
+    #     charger     - ChargerSoA representning the start of current control
+    #                   interval with numAllEV-by-1 fields:
+    #         active    - True if there is an active EV charging at charger ii,
+    #                     False otherwise
+    #         remEnergy - remaining energy demand at START of current control
+    #                     interval
+    #         remTime   - remaning parking time
+    #         peakRate  - peak charging rate
     #     allEV       - #EV-by-4 matrix where each row is an EV, and the columns
     #                   specify energy demanded, arrival time, departure time, and peak
     #                   charging rate; arrival time and departure time are in #control
@@ -24,15 +26,13 @@ def getPercentage(charger, AllEV):
     #                  percentage(ii) is set to NaN.
     #     dev = standard deviation of percentages for active chargers
 
-    numChargers = len(charger)
-    percentage = np.empty(shape=(numChargers, 1))
-    aev = 0
-    for ii in range(numChargers):
-        if charger[ii].get('active') == 1:
-            aev += 1
-            percentage[ii] = 1 - (charger[ii].get('EV')[0] / AllEV[ii][0])
+    active = charger.active
+    activePercentage = charger.remEnergy[active] / AllEV[active,0]
+    np.subtract(1, activePercentage, out=activePercentage)
+    dev = getStandardDev(activePercentage)
 
-    dev = getStandardDev(percentage)
+    percentage = np.full(len(charger), np.nan)
+    percentage[active] = activePercentage
     return percentage, dev
 
 
@@ -53,13 +53,14 @@ def getAvgPercentage(percentage, numActiveEV):
 
 def getLaxity(charger, timeint):
     # Input:
-    #     charger     - 1-by-numAllEV list of dictionaries representning the start of
-    #                   current control interval with fields:
-    #         active  - 1 if there is an active EV charging at charger ii,
-    #                   0 otherwise
-    #         EV      - 1x3 row vector with columns remaining energy demand at
-    #                   START of current control interval, remaning parking
-    #                   time and peak charging rate
+    #     charger     - ChargerSoA representning the start of current control
+    #                   interval with numAllEV-by-1 fields:
+    #         active    - True if there is an active EV charging at charger ii,
+    #                     False otherwise
+    #         remEnergy - remaining energy demand at START of current control
+    #                     interval
+    #         remTime   - remaning parking time
+    #         peakRate  - peak charging rate
     #     timeint = length of control interval
     #
     # Output:
@@ -67,14 +68,18 @@ def getLaxity(charger, timeint):
     #              is inactive, laxity(ii) is set to NaN
     #     dev = standard deviation of laxities for active chargers
 
-    numAllEV = len(charger)
-    laxity = np.empty(shape=(numAllEV, 1))
-    for ii in range(numAllEV):
-        if charger[ii].get('active') == 1:
-            EV = charger[ii].get('EV')
-            laxity[ii] = 1 - EV[0] / (EV[2] * EV[1] * timeint)
-
-    dev = getStandardDev(laxity)
+    # Compute the laxities of the active chargers only (in place in one
+    # buffer), and take the standard deviation directly from them instead of
+    # re-filtering the NaN entries
+    active = charger.active
+    activeLaxity = charger.peakRate[active] * charger.remTime[active]
+    activeLaxity *= timeint
+    np.divide(charger.remEnergy[active], activeLaxity, out=activeLaxity)
+    np.subtract(1, activeLaxity, out=activeLaxity)
+    dev = getStandardDev(activeLaxity)
+
+    laxity = np.full(len(charger), np.nan)
+    laxity[active] = activeLaxity
     return laxity, dev
 
 
@@ -103,19 +108,13 @@ def getAvgCharging(schedule, t):
     #             currently being charged)
     #   dev = sample standard deviation
 
-    aev = 0
-    m = len(schedule)
-    tol = np.sum(schedule[:,t-1]) / (100*m)  # Tolerance level
-    tolSchedule = []
+    rates = schedule[:,t-1]
+    tol = np.sum(rates) / (100*len(rates))  # Tolerance level
 
     # Only include EVs with a charging rate exceeding tol
-    for i in range(m):
-        if schedule[i][t-1] > tol:
-            aev += 1
-            tolSchedule.append(schedule[i][t-1])
-    if aev > 0:
-        avgRate = np.sum(tolSchedule)/aev
-        dev = np.std(tolSchedule)
+    tolSchedule = rates[rates > tol]
+    if tolSchedule.size > 0:
+        avgRate, dev = getMeanStd(tolSchedule)
     else:
         # No EVs charging at time t
         avgRate = 0
@@ -125,28 +124,22 @@ def getAvgCharging(schedule, t):
 
 def getAvgRemEnergy(charger):
     # Input:
-    #     charger     - 1-by-numAllEV list of dictionaries representning the start of
-    #                   current control interval with fields:
-    #         active  - 1 if there is an active EV charging at charger ii,
-    #                   0 otherwise
-    #         EV      - 1x3 row vector with columns remaining energy demand at
-    #                   START of current control interval, remaning parking
-    #                   time and peak charging rate
+    #     charger     - ChargerSoA representning the start of current control
+    #                   interval with numAllEV-by-1 fields:
+    #         active    - True if there is an active EV charging at charger ii,
+    #                     False otherwise
+    #         remEnergy - remaining energy demand at START of current control
+    #                     interval
+    #         remTime   - remaning parking time
+    #         peakRate  - peak charging rate
     #
     # Output:
     #     avgRemEnergy = average remaning energy demand
     #     dev = standard deviation
 
-    numChargers = len(charger)
-    remEnergy = []
-    aev = 0
-    for ii in range(numChargers):
-        if charger[ii].get('active') == 1:
-            remEnergy.append(charger[ii].get('EV')[0])
-            aev += 1
-    if aev > 0:
-        avgRemEnergy = np.sum(remEnergy)/aev
-        dev = np.std(remEnergy)
+    remEnergy = charger.remEnergy[charger.active]
+    if remEnergy.size > 0:
+        avgRemEnergy, dev = getMeanStd(remEnergy)
     else:
         avgRemEnergy = 0
         dev = 0
@@ -155,13 +148,14 @@ def getAvgRemEnergy(charger):
 
 def getPredictReady(charger, schedule, timeint):
     # Input:
-    #     charger     - 1-by-numAllEV list of dictionaries representning the start of
-    #                   current control interval with fields:
-    #         active  - 1 if there is an active EV charging at charger ii,
-    #                   0 otherwise
-    #         EV      - 1x3 row vector with columns remaining energy demand at
-    #                   START of current control interval, remaning parking
-    #                   time and peak charging rate
+    #     charger     - ChargerSoA representning the start of current control
+    #                   interval with numAllEV-by-1 fields:
+    #         active    - True if there is an active EV charging at charger ii,
+    #                     False otherwise
+    #         remEnergy - remaining energy demand at START of current control
+    #                     interval
+    #         remTime   - remaning parking time
+    #         peakRate  - peak charging rate
     #     schedule    - numActiveEV-by-(opt_horizon - t) matrix of curent
     #                   schedule of charging rates for active EVs
     #     timeint     - Length of each control interval used in the OLP
@@ -176,28 +170,22 @@ def getPredictReady(charger, schedule, timeint):
     # Assuming that the EVs in schedule are in the same order as in charger
 
     numAllEV = len(charger)
-    predReady = np.empty(shape=(numAllEV, 1))
-    aev = 1
-    for ii in range(numAllEV):
-        # Check if still need charge
-        if charger[ii].get('active') == 1:
-            demand = charger[ii].get('EV')[0]
-            # Already fully charged
-            if demand < 0.1:
-                aev += 1
-            # Demand will be met with current schedule
-            elif np.sum(timeint * schedule[aev - 1,:]) < demand * 0.99:
-                predReady[ii] = -1
-                aev += 1
-            # Find time instance when fully charged (99%)
-            else:
-                charged = 0
-                t = 0
-                while demand*0.99 >= charged:
-                    charged += schedule[aev - 1][t] * timeint
-                    t += 1
-                predReady[ii] = t * timeint
-                aev += 1
+    predReady = np.full(numAllEV, np.nan)
+    # Energy charged by the end of each control interval for all active EVs
+    charged = np.cumsum(schedule * timeint, axis=1)
+    # Row aev of schedule belongs to the aev-th active charger
+    for aev, ii in enumerate(np.flatnonzero(charger.active)):
+        demand = charger.remEnergy[ii]
+        # Already fully charged
+        if demand < 0.1:
+            continue
+        # Demand will not be met with current schedule
+        if charged[aev,-1] < demand * 0.99:
+            predReady[ii] = -1
+        # Find time instance when fully charged (99%)
+        else:
+            t = np.searchsorted(charged[aev], demand * 0.99, side='right') + 1
+            predReady[ii] = t * timeint
     return predReady
 
 
@@ -212,9 +200,10 @@ def getSuccessRate(predictReady):
     # Output:
     #   fraction of active chargers that will be ready on current schedule
 
+    predictReady = np.ravel(predictReady)
     aReady = predictReady[~np.isnan(predictReady)]
-    if len(aReady) != 0:
-        return sum(x > 0 for x in aReady) / len(aReady)
+    if aReady.size != 0:
+        return np.count_nonzero(aReady > 0) / aReady.size
     else:
         return 1
 
@@ -225,23 +214,16 @@ def getAvgTotEnergy(allEV, chargerID, numActiveEV):
     #                 specify energy demanded, arrival time, departure time, and peak
     #                 charging rate; arrival time and departure time are in #control
     #                 invervals, not minutes
-    #   charger     - 1-by-numAllEV list of dictionaries representning the start of
-    #                 current control interval with fields:
-    #       active  - 1 if there is an active EV charging at charger ii,
-    #                 0 otherwise
-    #       EV      - 1x3 row vector with columns remaining energy demand at
-    #                 START of current control interval, remaning parking
-    #                 time and peak charging rate
+    #   chargerID   - numActiveEV integer vector that maps each active EV to its
+    #                 charger ID (row of allEV)
     #   numActiveEV - Number of currently active EVs
     #
     # Output:
-    #   avg - avarge amount of energy being used over the active EV's
-    #   dev - standard deviation in amount of energy being used over the active EV's
+    #   avg - avarge total energy demand over the active EV's
+    #   dev - standard deviation in total energy demand over the active EV's
 
     if numActiveEV > 0:
-        c_id = int(chargerID[0])
-        avg = np.sum(allEV[c_id][0]) / numActiveEV
-        dev = np.std(allEV[c_id][0])
+        avg, dev = getMeanStd(allEV[chargerID, 0])
     else:
         avg = 0
         dev = 0
@@ -261,13 +243,29 @@ def getTotalPower(schedule, t):
 
 def getStandardDev(data):
     # Input:
-    #     data - some list of values
+    #     data - vector of values of the active chargers only (no NaN
+    #            placeholders for inactive chargers)
     #
     # Output:
-    #     standard deviation over the non NaN elements in the data
+    #     standard deviation over the data, 0 if there is no data
 
-    data = data[~np.isnan(data)]
-    if len(data) != 0:
+    if data.size != 0:
         return np.std(data)
     else:
         return 0
+
+
+def getMeanStd(data):
+    # Input:
+    #     data - non-empty vector of values
+    #
+    # Output:
+    #     mean and standard deviation of the data. Same result as np.mean and
+    #     np.std, but the mean is computed only once and reused for the
+    #     deviation, which avoids most of the call overhead of np.std on the
+    #     small samples seen at each control interval.
+
+    n = data.size
+    mean = np.sum(data) / n
+    deviation = data - mean
+    return mean, math.sqrt(np.dot(deviation, deviation) / n)
@@ -9,6 +9,34 @@ import scipy
 import numpy as np
 
 
+class ChargerSoA(object):
+
+    # State of all chargers (parking spots) of the ACN at the start of a control
+    # interval. Every field is stored as its own numAllEV-by-1 array (structure
+    # of arrays) so that the per-interval updates and statistics can operate on
+    # whole vectors instead of one charger at a time.
+    #
+    # ChargerSoA Parameters:
+    #   active      - True if there is an active EV charging at charger ii,
+    #                 False otherwise
+    #   remEnergy   - remaining energy demand at START of current control
+    #                 interval
+    #   remTime     - remaining parking time
+    #   peakRate    - peak charging rate
+    #
+    # remEnergy, remTime and peakRate are 0 for inactive chargers. active is a
+    # boolean array so that it can be used as a mask directly.
+
+    def __init__(self, numChargers):
+        self.active = np.zeros(numChargers, dtype=bool)
+        self.remEnergy = np.zeros(numChargers)
+        self.remTime = np.zeros(numChargers)
+        self.peakRate = np.zeros(numChargers)
+
+    def __len__(self):
+        return len(self.active)
+
+
 def getACN(fname, timeint, opt_horizon):
     # Input:
     #   fname : file that contains an #EV-by-4 matrix A where each row is
@@ -24,38 +52,39 @@ def getACN(fname, timeint, opt_horizon):
     #           charging rate; arrival time and departuretime are in #control invervals.
     #   power_cap : 1-by-(opt_horizon-1) vector of time-varying power limit for ACN;
 
-    matfile = scio.loadmat(fname)
-    AllEV = np.array(matfile['A'])
+    # loadmat already returns a column-major array, which is kept as is since
+    # AllEV is mostly accessed by columns
+    matfile = scio.loadmat(fname, mat_dtype=True)
+    AllEV = np.asfortranarray(matfile['A'], dtype=np.float64)
 
-    if round(timeint) <= 0:
+    # Convert arrival and departure times to #control intervals in place
+    if timeint <= 0:
         NotifyAbort(1)
-    elif round(timeint) > 1:
-        AllEV[:,1] = np.floor(AllEV[:,1]/timeint)
-        AllEV[:,2] = np.ceil(AllEV[:,2]/timeint)
+    elif timeint != 1:
+        np.divide(AllEV[:,1:3], timeint, out=AllEV[:,1:3])
+        np.floor(AllEV[:,1], out=AllEV[:,1])
+        np.ceil(AllEV[:,2], out=AllEV[:,2])
 
     power_cap = 20*np.ones(shape=(1, opt_horizon - 1))
 
     return AllEV, power_cap
 
 
-def getActiveEV(charger, numAllEV, numActiveEV, opt_horizon):
+def getActiveEV(charger, opt_horizon):
     # Input:
-    #   1-by-numAllEV struc array charger with fields
-    #       charger(ii).active = 1 if there is an active EV charging at charger
-    #                           (parking spot) ii, and 0 otherwise;
-    #       charger(ii).EV = EVii is a 1x3 row vector
-    #                           EVi(1,1) = remaining energy demand;
-    #                           EVi(1,2) = remaining parking time (rpt);
-    #                           EVi(1,3) = peak charging rate (scalar)
-    #   numAllEV : number of chargers;
-    #   numActiveEV : number of active (charging) EV;
+    #   charger : ChargerSoA with numAllEV-by-1 fields
+    #       charger.active[ii] = True if there is an active EV charging at charger
+    #                           (parking spot) ii, and False otherwise;
+    #       charger.remEnergy[ii] = remaining energy demand;
+    #       charger.remTime[ii] = remaining parking time (rpt);
+    #       charger.peakRate[ii] = peak charging rate (scalar)
     #   opt_horizon : time horizon for optimization (in #control intervals)
     #
     # Output:
     #   numActiveEV-by-3 array ActiveEV for each charger i that has an active
-    #   (charging) EV, i.e., chargers(i).active==1.
-    #       chargerID : numActiveEV-by-1 vector that maps each active EV in the array
-    #                   ActiveEV to its charger ID (index of the struct array charger).
+    #   (charging) EV, i.e., charger.active[i] is True.
+    #       chargerID : numActiveEV integer vector that maps each active EV in the array
+    #                   ActiveEV to its charger ID (index into the charger arrays).
     #                   This will be used for updating the charging rates for each
     #                   active EV in ACN.
     #
@@ -66,16 +95,11 @@ def getActiveEV(charger, numAllEV, numActiveEV, opt_horizon):
     #                       ActiveEV(aev, 3) = peak charging rate (scalar)
     #   Note that ActiveEV(aev,2) = opt_horizon-1 if remaining parking time is longer.
 
-    ActiveEV = np.zeros(shape=(numActiveEV, 3))
-    chargerID = np.zeros(shape=(numActiveEV, 1))
-    aev = 0
-    for ev in range(numAllEV):
-        if charger[ev].get('active') == 1:
-            ActiveEV[aev,:] = charger[ev].get('EV')
-            if ActiveEV[aev][1] > opt_horizon:
-                ActiveEV[aev][1] = opt_horizon - 1
-            chargerID[aev] = ev
-            aev += 1
+    chargerID = np.flatnonzero(charger.active)
+    ActiveEV = np.column_stack((charger.remEnergy[chargerID],
+                                charger.remTime[chargerID],
+                                charger.peakRate[chargerID]))
+    np.minimum(ActiveEV[:,1], opt_horizon - 1, out=ActiveEV[:,1])
     return ActiveEV, chargerID
 
 
@@ -99,25 +123,29 @@ def checkEV(EV, timeint, time, ecode):
     m = len(EV)
     if m <= 0:
         ecode[0] = 1
+        return ecode
 
     # Check energy demand > 0
-    if sum(EV[:,0] <= 0) > 0:  # EV demands <= 0 energy
+    if np.any(EV[:,0] <= 0):  # EV demands <= 0 energy
         ecode[1] = 1
 
     # Check arrival times < departure times for all EV
     duration = EV[:,2] - EV[:,1]
-    if sum(duration <= 0) > 0:
+    if np.any(duration <= 0):
         ecode[2] = 1
 
     # Check departure times < time for all EV
-    deadline = time - EV[:,2]
-    if sum(deadline < 0) > 0:
+    if np.any(EV[:,2] > time):
         ecode[3] = 1
 
     # Check:
     #   laxity = 1 - energy_demand / ((departure - arriva)*max_rate*timeint) >= 0
-    laxity = 1 - EV[:,0] / ((EV[:,2] - EV[:,1]) * EV[:,3] * timeint)
-    if sum(laxity < 0) > 0 or sum(laxity > 1) > 0:
+    #   computed in place in one buffer instead of one temporary per operation
+    laxity = duration * EV[:,3]
+    laxity *= timeint
+    np.divide(EV[:,0], laxity, out=laxity)
+    np.subtract(1, laxity, out=laxity)
+    if np.any((laxity < 0) | (laxity > 1)):
         ecode[4] = 1
 
     return ecode
@@ -125,6 +153,8 @@ def checkEV(EV, timeint, time, ecode):
 
 def updateCharger(oldcharger, AllEV, t, current_rate, timeint):
     # Input:
+    #   oldcharger : ChargerSoA at the start of the previous control interval;
+    #       it is not modified
     #   AllEV : #AllEV-by-4 matrix where each row is an EV and the columns specify
     #       energy demanded, arrival time, departure time, and peak charging rate;
     #       arrive time and departure time are in #control invervals, not minutes.
@@ -135,31 +165,33 @@ def updateCharger(oldcharger, AllEV, t, current_rate, timeint):
     #           remaining energy = old energy - current_rate*timeint
     #
     # Output:
-    #   Initialize the 1-by-numAllEV list of dictionaries representning the start of
-    #                 current control interval with fields:
-    #       active  - 1 if there is an active EV charging at charger ii,
-    #                 0 otherwise
-    #       EV      - 1x3 row vector with columns remaining energy demand at
-    #                 START of current control interval, remaning parking
-    #                 time and peak charging rate
-
-    charger = oldcharger
-    numAllEV = len(AllEV)
-    for ii in range(numAllEV):
-        if t > AllEV[ii][1] and t < AllEV[ii][2]:
-            if oldcharger[ii].get('active') == 1:
-                charger[ii]['active'] = 1
-                charger[ii]['EV'][0] = oldcharger[ii]['EV'][0] - current_rate[ii]*timeint
-                charger[ii]['EV'][1] = AllEV[ii][2] - t
-                charger[ii]['EV'][2] = AllEV[ii][3]
-            else:
-                charger[ii]['active'] = 1
-                charger[ii]['EV'] = [AllEV[ii][0], AllEV[ii][2] - t, AllEV[ii][3]]
-        else:
-            charger[ii]['active'] = 0
-            charger[ii]['EV'] = [0, 0, 0]
+    #   New ChargerSoA representning the start of current control interval with
+    #   numAllEV-by-1 fields:
+    #       active    - True if there is an active EV charging at charger ii,
+    #                   False otherwise
+    #       remEnergy - remaining energy demand at START of current control
+    #                   interval
+    #       remTime   - remaning parking time
+    #       peakRate  - peak charging rate
+
+    # EVs parked at their charger during the current control interval, and
+    # those of them that were already charging during the previous one
+    parked = (t > AllEV[:,1]) & (t < AllEV[:,2])
+    charging = parked & oldcharger.active
+
+    # Chargers without a parked EV are left inactive with all fields 0. The
+    # fields are written with masked ufuncs so that no gathered copies of
+    # AllEV or oldcharger are made.
+    charger = ChargerSoA(len(AllEV))
+    np.copyto(charger.active, True, where=parked)
+    # Newly arrived EVs start from their full energy demand
+    np.copyto(charger.remEnergy, AllEV[:,0], where=parked)
+    np.subtract(oldcharger.remEnergy, current_rate*timeint,
+                out=charger.remEnergy, where=charging)
+    np.subtract(AllEV[:,2], t, out=charger.remTime, where=parked)
+    np.copyto(charger.peakRate, AllEV[:,3], where=parked)
     return charger
 
 
 def NotifyAbort(ecode):
-    print('Problem: NotifyAbort error code =     #d\n'     # ecode)
+    print('Problem: NotifyAbort error code = %d\n' % ecode)
@@ -48,21 +48,29 @@ class EVModel(object):
     #                 rates calculated using the OLP algorithm. If the online
     #                 LP problem is infeasible, rate is not a vailid charging schedule.
     #   t           - Last control interval that was analyzed
-    #   charger     - 1-by-numAllEV list of dictionaries representning the start of
-    #                 current control interval with fields:
-    #       active  - 1 if there is an active EV charging at charger ii,
-    #                 0 otherwise
-    #       EV      - 1x3 row vector with columns remaining energy demand at
-    #                 START of current control interval, remaning parking
-    #                 time and peak charging rate
+    #   charger     - ev_funcs.ChargerSoA representning the start of current
+    #                 control interval with numAllEV-by-1 fields:
+    #       active    - True if there is an active EV charging at charger ii,
+    #                   False otherwise
+    #       remEnergy - remaining energy demand at START of current control
+    #                   interval
+    #       remTime   - remaning parking time
+    #       peakRate  - peak charging rate
     #   chargerNew  - Same as charger but for the start of the next control
     #                 interval
-    #   chargerID   - numActiveEV-by-1 vector that maps each active EV in the array
-    #                 ActiveEV to its charger ID (index of the struct array charger)
+    #   chargerID   - numActiveEV integer vector that maps each active EV in the array
+    #                 ActiveEV to its charger ID (index into the charger arrays)
     #                 during this current control interval.
     #   chargerIDNew - Same as chargerID but for the start of the next control interval.
     #   schedule    - numActiveEV-by-(opt_horizon - t) matrix of curent
     #                 schedule of charging rates for active EVs
+    #   scheduleBuf - Buffer of numAllEV*opt_horizon rates; schedule is a
+    #                 column-major view into it, so that no schedule is allocated
+    #                 in each control interval
+    #   lpActiveEV  - activeEV matrix of the last feasible online LP, or None
+    #   lpSchedule  - Untrimmed optimal schedule of the last feasible online
+    #                 LP, or None. Used to skip the LP when the next one is the
+    #                 same problem advanced by one control interval.
     #   histSchedule - numAllEV-by-t matrix of charging rates that has been
     #                 used to charge the set of all EV. Each row corresponds
     #                 to one of the EVs in the EV set that is studdied.
@@ -91,7 +99,11 @@ class EVModel(object):
     #   totalPower  - Current power consumption (in kW)
     #
     # EVModel Methods:
-    #   update - Advances the EVModel tstep control intervals
+    #   update       - Advances the EVModel tstep control intervals and
+    #                  computes the statistics
+    #   advance      - Advances the EVModel a given number of control
+    #                  intervals without computing the statistics
+    #   computeStats - Computes the statistics for the current control interval
 
     def __init__(self, dataSet, setName, fn, startTime, tstep):
 
@@ -111,8 +123,8 @@ class EVModel(object):
         # ------------------------------------------------
 
         self.timeint = 2
-        self.tmax = round(60/2 * 12)
-        self.opt_horizon = 60/2 * 12
+        self.tmax = 60//2 * 12
+        self.opt_horizon = 60//2 * 12
 
         self.startTime = startTime
         self.tstep = tstep
@@ -144,7 +156,11 @@ class EVModel(object):
         self.numAllEV = len(self.allEV)
 
         # TODO (anshul): remove this random shuffle with assignments to parking spots
-        np.random.shuffle(self.allEV)
+        # The shuffle is seeded with the file number so that every model is
+        # reproducible and independent of the global random state, also when
+        # models are simulated in parallel.
+        rng = np.random.default_rng(fn)
+        self.allEV[:] = self.allEV[rng.permutation(self.numAllEV)]
 
         # Check EV set
         ecode = np.zeros(shape=(5,1))
@@ -158,20 +174,23 @@ class EVModel(object):
         self.powerCap = 100 * np.ones(shape=(1, self.opt_horizon))
 
         # Initialize rate matrix
-        self.rate = np.zeros(shape=(self.numAllEV, self.tmax))
-
-        # Initialize chargers (saved as list of dictionaries)
-        self.chargerNew = []
-        # The struct array charger will be continuously updated.
-        for i in range(self.numAllEV):
-            if 0 >= self.allEV[i][1] and 0 < self.allEV[i][2]:
-                self.chargerNew.append(
-                    {"active" : 1,
-                    "EV" : [self.allEV[i][0], self.allEV[i][2], self.allEV[i][3]]})
-            else:
-                self.chargerNew.append(
-                    {"active" : 0,
-                    "EV" : [0, 0, 0]})
+        self.rate = np.zeros(shape=(self.numAllEV, self.tmax), dtype=np.float64, order='C')
+
+        # Initialize chargers (saved as one array per field) with the EVs that
+        # are parked at time 0. The charger arrays will be continuously updated.
+        self.chargerNew = ev_funcs.ChargerSoA(self.numAllEV)
+        parked = (self.allEV[:,1] <= 0) & (self.allEV[:,2] > 0)
+        self.chargerNew.active[parked] = True
+        self.chargerNew.remEnergy[parked] = self.allEV[parked,0]
+        self.chargerNew.remTime[parked] = self.allEV[parked,2]
+        self.chargerNew.peakRate[parked] = self.allEV[parked,3]
+
+        # Storage for the schedule of every control interval
+        self.scheduleBuf = np.zeros(self.numAllEV * self.opt_horizon)
+
+        # Last feasible LP, used to warm start the next one
+        self.lpActiveEV = None
+        self.lpSchedule = None
 
         self.t = -1  # Next control interval starts at 0
 
@@ -181,52 +200,72 @@ class EVModel(object):
     def update(self):
         # ------- Update EV Model ----------
 
-        # Online LP iteration
+        self.advance(self.tstep)
+        self.computeStats()
 
-        for ti in range(self.t + 1, self.t + self.tstep + 1):
-            self.numActiveEV = 0
 
-            for ii in range(self.numAllEV):
-                self.numActiveEV += self.chargerNew[ii].get('active')
+    def advance(self, tstep):
+        # Input:
+        #   tstep - Number of control intervals to advance
+        #
+        # Runs the online LP for the next tstep control intervals. The
+        # statistics are not updated; callers that advance over many control
+        # intervals call computeStats once they need them.
 
-            self.chargerIDNew = []
-            self.schedule = np.zeros(shape=(self.numActiveEV, self.opt_horizon))
+        # Online LP iteration
 
+        for ti in range(self.t + 1, self.t + tstep + 1):
+            # Extract from the numAllEV chargers in chargerNew and store into
+            # the #activeEV-by-3 array ActiveEV for each charger i that has an active
+            # (charging) EV, i.e., chargerNew.active[i] is True.
+            #   chargerID : numActiveEV integer vector that maps each active EV in the array
+            #           ActiveEV to its charger ID (index into the charger arrays).
+            #           This will be used for updating the charging rates for each
+            #           active EV in ACN.
+            #
+            #   ActiveEV : numActiveEV-by-3 array where each row aev is an active EV
+            #           and the columns specify:
+            #               ActiveEV(aev, 1) = remaining energy demand;
+            #               ActiveEV(aev, 2) = min(remaining parking time,
+            #                                   opt_horizon-1)
+            #               ActiveEV(aev, 3) = peak charging rate (scalar)
+            # Note that ActiveEV(aev,2) = opt_horizon-1 if remaining parking
+            # time is longer.
+            self.activeEV, self.chargerIDNew = ev_funcs.getActiveEV(
+                self.chargerNew, self.opt_horizon)
+            self.numActiveEV = len(self.chargerIDNew)
+            self.schedule = self.scheduleBuf[:self.numActiveEV * self.opt_horizon].reshape(
+                (self.numActiveEV, self.opt_horizon), order='F')
+
+            # No active EVs: there is nothing to schedule
             if self.numActiveEV > 0:
-                # Extract from the 1-by-numAllEV struct array charger and store into
-                # the #activeEV-by-3 array ActiveEV for each charger i that has an active
-                # (charging) EV, i.e., chargers(i).active==1.
-                #   chargerID : numActiveEV-by-1 vector that maps each active EV in the array
-                #           ActiveEV to its charger ID (index of the struct array charger).
-                #           This will be used for updating the charging rates for each
-                #           active EV in ACN.
-                #
-                #   ActiveEV : numActiveEV-by-3 array where each row aev is an active EV
-                #           and the columns specify:
-                #               ActiveEV(aev, 1) = remaining energy demand;
-                #               ActiveEV(aev, 2) = min(remaining parking time,
-                #                                   opt_horizon-1)
-                #               ActiveEV(aev, 3) = peak charging rate (scalar)
-                # Note that ActiveEV(aev,2) = opt_horizon-1 if remaining parking
-                # time is longer.
-
-                self.activeEV, self.chargerIDNew = ev_funcs.getActiveEV(
-                    self.chargerNew, self.numAllEV, self.numActiveEV, self.opt_horizon)
-                self.activeEV[:,0] = np.round(self.activeEV[:,0], decimals=6)
+                np.round(self.activeEV[:,0], decimals=6, out=self.activeEV[:,0])
 
                 # Compute charging rates for all active EVs for all t=1, ..,
                 # opt_horizon-1 and store them into the
                 # numActiveEV-by-(opt_horizon-1) matrix schedule.
-                self.schedule, feasible, _, _ = lp_alg.AlgLP2v2(
-                    self.activeEV, self.powerCap, self.timeint, self.opt_horizon)
+                # The previous optimal schedule is reused when the LP is just
+                # the previous one advanced by one control interval. It is
+                # stored in the same buffer and shifted in place.
+                if lp_alg.shiftSchedule(self.activeEV, self.powerCap, self.timeint,
+                                        self.lpActiveEV, self.lpSchedule,
+                                        out=self.schedule) is not None:
+                    feasible = 1
+                else:
+                    _, feasible, _, _ = lp_alg.AlgLP2v2(
+                        self.activeEV, self.powerCap, self.timeint, self.opt_horizon,
+                        out=self.schedule)
 
                 if feasible:
+                    self.lpActiveEV = self.activeEV
+                    self.lpSchedule = self.schedule
                     # update charging rates for active EVs for time t by setting
                     # rate(chargerID(aev), t) = schedule(aev,1);
                     # This is MPC (model predictive control)
-                    for aev in range(self.numActiveEV):
-                        self.rate[int(self.chargerIDNew[aev])][ti] = self.schedule[aev][0]
+                    self.rate[self.chargerIDNew, ti] = self.schedule[:, 0]
                 else:
+                    self.lpActiveEV = None
+                    self.lpSchedule = None
                     print('Infeasible OLP!')
 
             self.charger = self.chargerNew
@@ -239,11 +278,31 @@ class EVModel(object):
         self.lastUpdate = self.startTime + self.timeint * self.t
 
         # Reformat schedule and histSchedule
-        self.schedule = self.schedule[:, 0:(len(self.schedule[0]) - self.t)]
+        self.schedule = self.schedule[:, 0:(self.opt_horizon - self.t)]
         self.histSchedule = self.rate[:, 0:self.t]
 
-        # Statistical calculations
+
+    def computeStats(self):
+        # Statistical calculations for the control interval that was analyzed
+        # last
         self.numChargers = len(self.charger)
+        if self.numActiveEV == 0:
+            # No active EVs: skip the calculations and use the values they
+            # return for an empty network
+            self.percentage = np.full(self.numChargers, np.nan)
+            self.devPercentage = 0
+            self.avgPercentage = 1
+            self.laxity = np.full(self.numChargers, np.nan)
+            self.devLaxity = 0
+            self.avgLaxity = 1
+            self.avgCharg, self.devCharg = 0, 0
+            self.avgRemEnergy, self.devRemEnergy = 0, 0
+            self.predictReady = np.full(self.numChargers, np.nan)
+            self.successRate = 1
+            self.avgTotEnergy, self.devTotEnergy = 0, 0
+            self.totalPower = 0
+            return
+
         self.percentage, self.devPercentage = calcs.getPercentage(self.charger, self.allEV)
         self.avgPercentage = calcs.getAvgPercentage(self.percentage, self.numActiveEV)
         self.laxity, self.devLaxity = calcs.getLaxity(self.charger, self.timeint)
@@ -266,12 +325,19 @@ class EVModel(object):
         # print(self.totalPower)
 
 
+# .mat files found under each root path, see rdir
+rdirCache = {}
+
 def rdir(rootpath):
     """
     Returns all .mat files that appear in any subdirectory of the rootpath directory.
+    The directory walk is only done once per rootpath; later calls return a copy
+    of the cached result.
     """
-    matches = []
-    for root, dirnames, filenames in os.walk(rootpath):
-        for filename in fnmatch.filter(filenames, '*.mat'):
-            matches.append(os.path.join(root, filename))
-    return matches
+    if rootpath not in rdirCache:
+        matches = []
+        for root, dirnames, filenames in os.walk(rootpath):
+            for filename in fnmatch.filter(filenames, '*.mat'):
+                matches.append(os.path.join(root, filename))
+        rdirCache[rootpath] = matches
+    return list(rdirCache[rootpath])
@@ -6,10 +6,13 @@ network approach to the distribution of energy.
 import scipy.io as scio
 import math
 import scipy
+import scipy.optimize
+import scipy.sparse
+import functools
 import numpy as np
 
 
-def AlgLP2v2(EV, powermax, timeint, time):
+def AlgLP2v2(EV, powermax, timeint, time, method='highs-ds', out=None):
     # Input:
     #   EV : m-by-3 matrix where each row is an active (charging) EV, and the
     #           columns specify:
@@ -19,7 +22,12 @@ def AlgLP2v2(EV, powermax, timeint, time):
     #   powermax : time-by-1 column vector of power capacity for ACN;
     #   timeint : length of control interval in minutes; used in equality
     #               constraint: sum_t X_i(t) * timeint  =  energydemand
-    #   time : time horizon for optimization
+    #   time : time horizon for optimization (integer #control intervals)
+    #   method : linprog solver used for the LP; HiGHS dual simplex by default,
+    #               which was the fastest HiGHS solver for these LPs from tens
+    #               to hundreds of active EVs
+    #   out : optional m-by-time array the schedule is written into; a new
+    #               array is allocated if out is None
     #
     # AlgLP2(...) computes an optimal charging schedule for the m EVs over the
     # horizon [0, 1, 2, ..., time-1] subject to max power constraint vector powermax,
@@ -36,61 +44,174 @@ def AlgLP2v2(EV, powermax, timeint, time):
     #   res.get('fun') = optimal objective value of LP if feasible==1
 
     m = len(EV)
-    time = int(time)
+
+    # If all EVs charging at their peak rates cannot exceed the power capacity,
+    # the LP decouples into one LP per EV, which is solved in closed form
+    if np.sum(EV[:, 2]) <= np.min(powermax):
+        schedule = greedySchedule(EV, timeint, time, out)
+        if schedule is not None:
+            fun = np.sum(schedule.dot(np.arange(1.0, time + 1)))
+            return schedule, 1, True, fun
 
     # Create A and b for inequality contraints A*x <= b for LP
     #     Sum of rates <= powermax: A1*x <= powermax
-    A1 = np.zeros(shape=(time, m*time))
-    for c1 in range(time):
-        for c2 in range(m):
-            A1[c1][c2 + m*c1] = 1
-    b1 = powermax
-
     # Create Aeq and beq for equality constraints for LP
     #    Satisfy all demands exactly
     #      Note that energy in each period is X_i(t) * timeint, not X_i(t)
-    Aeq = np.zeros(shape=(m, m*time))
-    for c1 in range(time):
-        Aeq[:, m*c1:m*(c1+1)] = np.identity(m)
-    Aeq = Aeq * timeint
+    A1, Aeq = getConstraintMatrices(m, time, timeint)
+    b1 = powermax
     beq = EV[:, 0]
 
     # Upper and lower bounds
     #     Individual rates lower bounded by 0: 0 <= x
     #     Individual rates <= max rates: x <= r-bar
     #       for each EV i=1:m, set max rates to EV(:,3) if t < EV(i:m,2)
-    bounds_arr = np.zeros(shape=(m*time, 2))
-    for c1 in range(time):
-        for c2 in range(m):
-            if c1 < EV[c2][1]:
-                bounds_arr[c2 + m*c1][1] = EV[c2][2]
-    bounds = []
-    for i in range(len(bounds_arr)):
-        bounds.append((bounds_arr[i][0], bounds_arr[i][1]))
+    #   parked[c1, c2] is True if EV c2 is still parked at time instant c1;
+    #   raveling it gives the same (time-major) ordering as X
+    parked = np.arange(time)[:, None] < EV[:, 1]
+    #   linprog takes the (lower, upper) pairs as an m*time-by-2 array
+    bounds = np.zeros(shape=(m*time, 2))
+    bounds[:, 1] = np.where(parked, EV[:, 2], 0).ravel()
 
     # Set linear cost function
     #   The charging rate r_i(t) of EV i at time t is weighted by (for ONline LP)
     #         t %* laxity(i)
     #   for t = 0, ..., t_i (remaining parking time EV(i, 2)
-    f = np.zeros(m*time)
-    for c1 in range(time):  # for each time instant c1=1, ..., time-1
-        for c2 in range(m):
-            if c1 < EV[c2][1]:
-                f[c2 + m*c1] = c1 + 1
+    f = np.where(parked, np.arange(1.0, time + 1)[:, None], 0).ravel()
 
-    # Solve LP
+    # Solve LP with the compiled HiGHS solver rather than relying on the
+    # default method of the installed SciPy version
     options = {'disp': False}
-    res = scipy.optimize.linprog(f, A1, b1, Aeq, beq, bounds, options=options)
+    res = scipy.optimize.linprog(f, A_ub=A1, b_ub=b1, A_eq=Aeq, b_eq=beq,
+                                 bounds=bounds, method=method, options=options)
     x = res.get('x')
     # LP is feasible and has converged to a solution
     if res.get('success'):
-        schedule = np.zeros(shape=(m, time))
-        for c1 in range(time):
-            schedule[:, c1] = x[m*c1:m*(c1+1)]
+        # x stores the m rates of each time instant contiguously, so its
+        # transposed reshape is a column-major schedule where the rates of all
+        # EVs at one time instant are contiguous
+        schedule = getScheduleArray(m, time, out)
+        schedule[:] = x.reshape(time, m).T
         feasible = 1
     # LP is infeasible
     else:
-        schedule = np.ones(shape=(m, time)) * -1
+        schedule = getScheduleArray(m, time, out)
+        schedule.fill(-1)
         feasible = 0
 
     return schedule, feasible, res.get('success'), res.get('fun')
+
+
+def greedySchedule(EV, timeint, time, out=None):
+    # Input:
+    #   EV : m-by-3 matrix of active EVs (see AlgLP2v2)
+    #   timeint : length of control interval in minutes
+    #   time : time horizon for optimization (integer #control intervals)
+    #   out : optional m-by-time array the schedule is written into
+    #
+    # Optimal schedule of the LP of AlgLP2v2 when the power capacity is never
+    # binding. Each EV is then scheduled on its own, and since the cost weights
+    # increase with time, the optimum is to charge at the peak rate as early as
+    # possible until the energy demand is met.
+    #
+    # Output:
+    #   schedule = m x time optimal charging schedule, or None if the demand of
+    #               some EV cannot be met before it leaves (the LP is then
+    #               solved to report it as infeasible)
+
+    if np.any(EV[:, 0] < 0):
+        return None
+    # Number of intervals at the peak rate, and the rate of the partially used
+    # interval after them
+    intervals = EV[:, 0] / (EV[:, 2] * timeint)
+    full = np.floor(intervals)
+    if np.any(np.ceil(intervals - 1e-9) > np.minimum(EV[:, 1], time)):
+        return None
+
+    schedule = getScheduleArray(len(EV), time, out)
+    schedule.fill(0)
+    np.copyto(schedule, EV[:, 2:3], where=np.arange(time) < full[:, None])
+    partial = full < np.minimum(EV[:, 1], time)
+    schedule[partial, full[partial].astype(int)] = np.maximum(
+        EV[partial, 0] / timeint - full[partial] * EV[partial, 2], 0)
+    return schedule
+
+
+@functools.lru_cache(maxsize=16)
+def getConstraintMatrices(m, time, timeint):
+    # Input:
+    #   m : number of active EVs
+    #   time : time horizon for optimization (integer #control intervals)
+    #   timeint : length of control interval in minutes
+    #
+    # The constraint matrices of AlgLP2v2 only depend on the shape of the LP,
+    # not on the EV data, so they are cached and shared between the LPs of
+    # all control intervals with the same number of active EVs. Both have
+    # exactly one nonzero per column (variable) and are built as sparse
+    # matrices, which HiGHS consumes directly. The returned matrices must not
+    # be modified.
+    #
+    # Output:
+    #   A1 = time x m*time matrix; row c1 sums the m rates of time instant c1
+    #   Aeq = m x m*time matrix; row c2 sums the energy of EV c2 over all time
+    #           instants
+
+    variables = np.arange(m*time)
+    A1 = scipy.sparse.csr_matrix(
+        (np.ones(m*time), (np.repeat(np.arange(time), m), variables)),
+        shape=(time, m*time))
+    Aeq = scipy.sparse.csr_matrix(
+        (np.full(m*time, float(timeint)), (np.tile(np.arange(m), time), variables)),
+        shape=(m, m*time))
+    return A1, Aeq
+
+
+def shiftSchedule(EV, powermax, timeint, prevEV, prevSchedule, out=None):
+    # Input:
+    #   EV : m-by-3 matrix of active EVs for the current control interval (see
+    #           AlgLP2v2)
+    #   powermax : time-by-1 column vector of power capacity for ACN;
+    #   timeint : length of control interval in minutes
+    #   prevEV : EV matrix of the previous control interval, or None
+    #   prevSchedule : optimal schedule AlgLP2v2 computed for prevEV, or None
+    #   out : optional m-by-time array the schedule is written into; it may be
+    #               prevSchedule itself, which is then shifted in place
+    #
+    # Warm start for the online LP. If the previous control interval charged
+    # exactly the same EVs, the first column of prevSchedule has been applied,
+    # and no remaining parking time was clipped to the horizon, then the LP of
+    # the current interval is the previous LP advanced by one interval. The
+    # tail of an optimal schedule is optimal for that LP as well (the cost
+    # weights only shift by a constant per EV), so it can be reused without
+    # solving the LP again. This assumes powermax is the same in every interval.
+    #
+    # Output:
+    #   schedule = m x time shifted optimal schedule, or None if the LP has to
+    #               be solved
+
+    if prevSchedule is None or EV.shape != prevEV.shape:
+        return None
+    if np.any(powermax != powermax.flat[0]):
+        return None
+    if not (np.array_equal(EV[:, 1], prevEV[:, 1] - 1)
+            and np.array_equal(EV[:, 2], prevEV[:, 2])
+            and np.allclose(EV[:, 0], prevEV[:, 0] - prevSchedule[:, 0] * timeint,
+                            rtol=0, atol=1e-5)):
+        return None
+
+    schedule = getScheduleArray(prevSchedule.shape[0], prevSchedule.shape[1], out)
+    schedule[:, :-1] = prevSchedule[:, 1:]
+    schedule[:, -1] = 0
+    return schedule
+
+
+def getScheduleArray(m, time, out):
+    # Returns out, or a new column-major m x time array if out is None. The
+    # contents of the returned array are undefined.
+
+    if out is None:
+        return np.empty(shape=(m, time), order='F')
+    if out.shape != (m, time):
+        raise ValueError('out must have shape (%d, %d)' % (m, time))
+    return out
+
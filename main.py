@@ -4,14 +4,15 @@ and then sees how the model behaves over time given a dataset of EV arrivals,
 departures, and energy need.
 """
 
+import concurrent.futures
 import evmodel
 
 # Data set group name (Mountain View, CAGarage, etc)
 dataSet = 'Mountain View'
-# Particular set name (MTV-41, CaGarage, etc)
-setName = 'MTV-41'
-# File number in dataSet/setName
-fn = 0
+# Particular set names to simulate (MTV-41, CaGarage, etc)
+setNames = ['MTV-41']
+# File numbers to simulate in each dataSet/setName
+fns = [0]
 # Start time of control period
 startTime = 0
 
@@ -20,8 +21,17 @@ tstep = 1
 # Time in seconds between updates
 timerPeriod = 1
 
+def runModel(setName, fn):
+    # Create and setup model parameters for one scenario
+    return evmodel.EVModel(dataSet, setName, fn, startTime, tstep)
+
 def main():
-    # Create and setup model parameters
-    model = evmodel.EVModel(dataSet, setName, fn, startTime, tstep)
+    # Sweep over all (set name, file number) scenarios; each scenario is an
+    # independent model, so they are simulated in parallel processes
+    scenarios = [(setName, fn) for setName in setNames for fn in fns]
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        models = list(executor.map(runModel, *zip(*scenarios)))
+    return models
 
-main()
+if __name__ == '__main__':
+    main()